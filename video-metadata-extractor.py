@@ -16,120 +16,363 @@ with their codecs, languages, and track numbers.
 """
 
 import os
-import glob
-import subprocess
-import json
-from openpyxl import Workbook
+import re
+import csv
+import asyncio
+import itertools
+import queue
+import threading
+import shutil
+import sqlite3
+from collections import deque
+from functools import lru_cache
 
+import orjson
+import xlsxwriter
 
-def get_metadata(path):
-    """Run ffprobe to extract metadata from the file."""
+try:
+    import av
+    from av.video.codeccontext import VideoCodecContext
+except ImportError:
+    av = None
+else:
+    # Older PyAV builds don't expose color info; without it HDR would be misreported, so use ffprobe there
+    if not all(hasattr(VideoCodecContext, attr) for attr in ('colorspace', 'color_trc')):
+        av = None
+
+# Resolve ffprobe once so each probe execs it directly instead of searching PATH
+_FFPROBE = shutil.which('ffprobe') or 'ffprobe'
+
+# ffprobe command line, minus the input path; built once and reused for every probe
+_FFPROBE_ARGV = (
+    _FFPROBE, '-v', 'error', '-threads', '1', '-show_entries',
+    'format=format_name,bit_rate:stream=index,codec_name,codec_type,profile,width,height,r_frame_rate,color_space,color_transfer:stream_tags=language',
+    '-of', 'json'
+)
+
+# Version of the cached metadata; bump it whenever _FFPROBE_ARGV or get_metadata_av changes what is extracted
+# so results cached by an older version are thrown away instead of being reused
+_CACHE_VERSION = 1
+
+# Seconds to wait for a single probe (ffprobe or PyAV) before giving up on it
+_PROBE_TIMEOUT = 30
+
+# Color space / transfer names that mark a stream as HDR
+_HDR_RE = re.compile(r'bt2020|smpte2084|arib[-_]std[-_]b67', re.IGNORECASE)
+
+# Sidecar and non-video files commonly found in media libraries. These go straight to ffprobe
+# instead of an in-process PyAV attempt; every other extension is read with PyAV first.
+_NON_MEDIA_EXTENSIONS = frozenset({
+    '.nfo', '.txt', '.xml', '.json', '.ini', '.log', '.url', '.nzb', '.torrent', '.sfv', '.md5', '.par2',
+    '.srt', '.sub', '.idx', '.ass', '.ssa', '.vtt',
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tbn',
+    '.db', '.pdf', '.zip', '.rar', '.7z',
+})
+
+# libav color enum values that PyAV reports as integers, named as ffprobe prints them
+_AV_COLOR_SPACES = {9: 'bt2020nc', 10: 'bt2020c'}
+_AV_COLOR_TRANSFERS = {16: 'smpte2084', 18: 'arib-std-b67'}
+
+# Rows that can wait for the writer thread before producers block
+_ROW_QUEUE_SIZE = 256
+
+# Number of files between cache commits
+_CACHE_COMMIT_EVERY = 500
+
+
+def get_metadata_av(path):
+    """Read metadata in-process with PyAV, laid out like ffprobe's JSON output."""
+    # libav checks the timeout through its interrupt callback while it reads and probes
+    with av.open(path, timeout=_PROBE_TIMEOUT) as container:
+        streams = []
+        for s in container.streams:
+            ctx = s.codec_context
+            stream = {'index': s.index, 'codec_type': s.type, 'codec_name': ctx.name if ctx else None}
+            if s.type == 'video':
+                rate = s.base_rate
+                stream.update(
+                    profile=ctx.profile,
+                    width=ctx.width,
+                    height=ctx.height,
+                    r_frame_rate=f"{rate.numerator}/{rate.denominator}" if rate else None,
+                    color_space=_AV_COLOR_SPACES.get(ctx.colorspace),
+                    color_transfer=_AV_COLOR_TRANSFERS.get(ctx.color_trc),
+                )
+            if 'language' in s.metadata:
+                stream['tags'] = {'language': s.metadata['language']}
+            streams.append(stream)
+        return {
+            'format': {'format_name': container.format.name, 'bit_rate': container.bit_rate},
+            'streams': streams,
+        }
+
+
+async def get_metadata_async(path, sem):
+    """Extract metadata with PyAV if available, otherwise (or for non-media files) with ffprobe."""
     try:
-        cmd = [
-            'ffprobe', '-v', 'error', '-show_entries',
-            'format=format_name,bit_rate,duration:stream=index,codec_name,codec_type,profile,width,height,r_frame_rate,bit_rate,color_space,color_transfer,tags',
-            '-of', 'json', path
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return json.loads(result.stdout)
+        async with sem:
+            print(f"Working on: {path}")
+            if av is not None and os.path.splitext(path)[1].lower() not in _NON_MEDIA_EXTENSIONS:
+                try:
+                    return await asyncio.to_thread(get_metadata_av, path)
+                except av.error.ExitError:
+                    print(f"Timed out reading metadata for {path}")
+                    return None
+                except Exception:
+                    pass  # Fall back to ffprobe if PyAV can't read it
+            proc = await asyncio.create_subprocess_exec(
+                *_FFPROBE_ARGV, path,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                out, _ = await asyncio.wait_for(proc.communicate(), timeout=_PROBE_TIMEOUT)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                print(f"Timed out reading metadata for {path}")
+                return None
+            if proc.returncode != 0:
+                # ffprobe still prints an empty JSON object on failure; don't let that be cached
+                print(f"Error reading metadata for {path}: ffprobe exited with code {proc.returncode}")
+                return None
+        return orjson.loads(out)
     except Exception as e:
         print(f"Error reading metadata for {path}: {e}")
         return None
 
 
-def size_in_gb(path):
+def walk_files(root, walked=None):
+    """Yield (path, stat) for all non-hidden files under root, recursively, following symlinks."""
+    # Remember each directory's real path so a symlink loop can't be walked forever
+    if walked is None:
+        walked = set()
+    real = os.path.realpath(root)
+    if real in walked:
+        return
+    walked.add(real)
+
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                # Skip hidden files and directories, as glob did (.DS_Store, ._* forks, .@__thumb)
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    yield from walk_files(entry.path, walked)
+                elif entry.is_file():
+                    try:
+                        st = entry.stat()
+                    except OSError as e:
+                        print(f"Error reading file {entry.path}: {e}")
+                        continue
+                    yield entry.path, st
+    except OSError as e:
+        print(f"Error reading directory {root}: {e}")
+
+
+def open_cache(cache_path):
+    """Open the metadata cache, creating its table if needed and dropping it if it is from another version."""
+    db = sqlite3.connect(cache_path)
+    if db.execute('PRAGMA user_version').fetchone()[0] != _CACHE_VERSION:
+        db.execute('DROP TABLE IF EXISTS cache')
+        db.execute(f'PRAGMA user_version = {_CACHE_VERSION}')
+    db.execute('CREATE TABLE IF NOT EXISTS cache (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, json TEXT)')
+    return db
+
+
+def load_cached(db, path, st):
+    """Return cached metadata for the file, or None if it is missing or stale."""
+    row = db.execute('SELECT json FROM cache WHERE path=? AND size=? AND mtime=?',
+                     (path, st.st_size, st.st_mtime_ns)).fetchone()
+    return orjson.loads(row[0]) if row else None
+
+
+def store_cached(db, path, st, meta):
+    """Save metadata for the file, replacing any stale entry."""
+    db.execute('INSERT OR REPLACE INTO cache (path, size, mtime, json) VALUES (?, ?, ?, ?)',
+               (path, st.st_size, st.st_mtime_ns, orjson.dumps(meta)))
+
+
+def size_in_gb(st):
     """Convert file size to GB."""
-    return round(os.path.getsize(path) / (1024 ** 3), 3)
+    return round(st.st_size / (1024 ** 3), 3)
 
 
+@lru_cache(maxsize=64)
 def parse_framerate(rate):
     """Convert frame rate from fraction to fps."""
     try:
-        num, denom = map(int, rate.split('/'))
-        return f"{num / denom:.3f} fps"
+        num, denom = rate.split('/', 1)
+        return f"{int(num) / int(denom):.3f} fps"
     except:
         return None
 
 
 def detect_hdr(color, transfer):
     """Guess if the video is HDR or SDR."""
-    hdr_keywords = ['bt2020', 'smpte2084', 'arib-std-b67']
-    if color or transfer:
-        if any(word in (color or '').lower() for word in hdr_keywords):
-            return 'HDR'
-        if any(word in (transfer or '').lower() for word in hdr_keywords):
-            return 'HDR'
+    if (color and _HDR_RE.search(color)) or (transfer and _HDR_RE.search(transfer)):
+        return 'HDR'
     return 'SDR'
 
 
-def create_report(paths, output_path):
-    """Main function to process files and write to Excel."""
-    wb = Workbook()
-    ws = wb.active
+def build_row(file, st, meta):
+    """Turn a file's ffprobe metadata into a report row."""
+    # Defaults
+    res = None
+    vid_codec = None
+    profile = None
+    bitrate = None
+    framerate = None
+    hdr = 'SDR'
+    audio_tracks = []
+    fmt = {}
+
+    if meta:
+        fmt = meta.get('format', {})
+        bitrate = fmt.get('bit_rate')
+        if bitrate:
+            bitrate = round(int(bitrate) / 1000, 2)
+
+        for stream in meta.get('streams', []):
+            if stream.get('codec_type') == 'video':
+                res = f"{stream.get('width')}x{stream.get('height')}"
+                vid_codec = stream.get('codec_name')
+                profile = stream.get('profile')
+                framerate = parse_framerate(stream.get('r_frame_rate'))
+                hdr = detect_hdr(stream.get('color_space'), stream.get('color_transfer'))
+            elif stream.get('codec_type') == 'audio':
+                track_num = stream.get('index')
+                codec = stream.get('codec_name')
+                lang = stream.get('tags', {}).get('language', 'Unknown').upper()
+                audio_tracks.append(f"Track {track_num}/{codec}/{lang}")
+
+    return [
+        file,
+        size_in_gb(st),
+        res,
+        '; '.join(audio_tracks) if audio_tracks else None,
+        vid_codec,
+        profile,
+        bitrate,
+        fmt.get('format_name'),
+        framerate,
+        hdr
+    ]
+
+
+def write_rows(rows, append):
+    """Write rows from the queue to the report until the None sentinel arrives."""
+    while True:
+        row = rows.get()
+        if row is None:
+            break
+        try:
+            append(row)
+        except Exception as e:
+            print(f"Error writing row for {row[0]}: {e}")
 
-    # Set headers
-    ws.append(
-        ['Path', 'Size (GB)', 'Resolution', 'Audio Tracks', 'Video Codec', 'Profile', 'Bitrate (kbps)', 'Container',
-         'Frame Rate', 'HDR/SDR'])
 
-    # Process paths
+async def probe_file(file, st, db, sem):
+    """Build the file's report row, from the cache if it is unchanged, otherwise by probing it."""
+    meta = load_cached(db, file, st)
+    if meta is None:
+        meta = await get_metadata_async(file, sem)
+        if meta is not None:
+            store_cached(db, file, st, meta)
+    return build_row(file, st, meta)
+
+
+async def process_files(files, db, rows, max_probes=64):
+    """Build rows for all files, probing up to max_probes at once, and queue them in file order."""
+    sem = asyncio.BoundedSemaphore(max_probes)
+
+    # Tasks are started in file order and awaited oldest first, so rows come out in order. Only a
+    # bounded window runs ahead of the row being written, which keeps finished rows from piling up.
+    files = iter(files)
+    window = deque()
+    done = 0
+    while True:
+        for file, st in itertools.islice(files, max_probes * 2 - len(window)):
+            window.append(asyncio.create_task(probe_file(file, st, db, sem)))
+        if not window:
+            break
+        rows.put(await window.popleft())
+        done += 1
+        if done % _CACHE_COMMIT_EVERY == 0:
+            db.commit()
+
+
+def create_report(paths, output_path):
+    """Main function to process files and write to Excel or CSV."""
+    if not output_path.endswith(('.xlsx', '.csv')):
+        output_path = os.path.join(output_path, "video_metadata.xlsx")
+    cache_path = os.path.join(os.path.dirname(output_path), "video_metadata_cache.sqlite")
+
+    # Collect files
+    found = []
+    walked = set()  # Shared across roots so overlapping directories are only walked once
     for path in paths:
         print(f"Looking in: {path}")
-        for file in glob.iglob(os.path.join(path, '**'), recursive=True):
-            if os.path.isfile(file):
-                print(f"Working on: {file}")
-                meta = get_metadata(file)
-
-                # Defaults
-                res = None
-                vid_codec = None
-                profile = None
-                bitrate = None
-                framerate = None
-                hdr = 'SDR'
-                audio_tracks = []
-
-                if meta:
-                    fmt = meta.get('format', {})
-                    bitrate = fmt.get('bit_rate')
-                    if bitrate:
-                        bitrate = round(int(bitrate) / 1000, 2)
-
-                    for stream in meta.get('streams', []):
-                        if stream.get('codec_type') == 'video':
-                            res = f"{stream.get('width')}x{stream.get('height')}"
-                            vid_codec = stream.get('codec_name')
-                            profile = stream.get('profile')
-                            framerate = parse_framerate(stream.get('r_frame_rate'))
-                            hdr = detect_hdr(stream.get('color_space'), stream.get('color_transfer'))
-                        elif stream.get('codec_type') == 'audio':
-                            track_num = stream.get('index')
-                            codec = stream.get('codec_name')
-                            lang = stream.get('tags', {}).get('language', 'Unknown').upper()
-                            audio_tracks.append(f"Track {track_num}/{codec}/{lang}")
-
-                # Add row
-                ws.append([
-                    file,
-                    size_in_gb(file),
-                    res,
-                    '; '.join(audio_tracks) if audio_tracks else None,
-                    vid_codec,
-                    profile,
-                    bitrate,
-                    fmt.get('format_name'),
-                    framerate,
-                    hdr
-                ])
-
-    # Save the Excel report
-    if not output_path.endswith('.xlsx'):
-        output_path = os.path.join(output_path, "video_metadata.xlsx")
+        found.extend(walk_files(path, walked))
+
+    # Handle each directory's files together so reads stay close on disk
+    found.sort(key=lambda item: (item[1].st_dev, *os.path.split(item[0])))
+
+    # Skip files already found through an overlapping directory or a symlink; the first path in sorted order is kept
+    files = []
+    seen = set()
+    for file, st in found:
+        real = os.path.realpath(file)
+        if real in seen:
+            continue
+        seen.add(real)
+        files.append((file, st))
+
+    db = open_cache(cache_path)
     try:
-        wb.save(output_path)
+        if output_path.endswith('.csv'):
+            csv_file = open(output_path, 'w', newline='', encoding='utf-8')
+            append = csv.writer(csv_file).writerow
+            close_report = csv_file.close
+        else:
+            # Constant-memory mode flushes each row to disk instead of keeping the sheet in memory
+            wb = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+            ws = wb.add_worksheet()
+            row_nums = itertools.count()
+            close_report = wb.close
+
+            def append(row):
+                ws.write_row(next(row_nums), 0, row)
+
+        # Set headers
+        append(
+            ['Path', 'Size (GB)', 'Resolution', 'Audio Tracks', 'Video Codec', 'Profile', 'Bitrate (kbps)',
+             'Container', 'Frame Rate', 'HDR/SDR'])
+
+        # A single writer thread serializes rows while probing carries on
+        rows = queue.Queue(_ROW_QUEUE_SIZE)
+        writer = threading.Thread(target=write_rows, args=(rows, append))
+        writer.start()
+        saved = False
+        try:
+            # Reuse cached metadata for unchanged files and probe the rest concurrently;
+            # each ffprobe is single-threaded, so run several at once
+            asyncio.run(process_files(files, db, rows))
+        finally:
+            # Always stop the writer and close the report, even if probing was interrupted
+            rows.put(None)
+            writer.join()
+            try:
+                close_report()
+                saved = True
+            except Exception as e:
+                print(f"Error saving report: {e}")
+    finally:
+        db.commit()
+        db.close()
+
+    if saved:
         print(f"Done. Saved report to {output_path}")
-    except Exception as e:
-        print(f"Error saving report: {e}")
 
 
 if __name__ == "__main__":
@@ -137,7 +380,8 @@ if __name__ == "__main__":
     Main entry point of the script.
 
     Update the 'dirs' list with directories to scan for video files.
-    Update the 'output_path' variable with the desired path for the Excel report.
+    Update the 'output_path' variable with the desired path for the Excel report
+    (or a path ending in '.csv' for a CSV report).
     Example:
         dirs = ["/path/to/videos", "/another/path/to/videos"]
         output_path = "/path/to/save/report"